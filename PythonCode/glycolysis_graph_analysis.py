@@ -1,171 +1,848 @@
+import os
+from importlib.util import find_spec
 import networkx as nx
+import numpy as np
 import pandas as pd
-from collections import deque
-import copy
+from array import array
+from dataclasses import dataclass, replace
+from functools import lru_cache
+import matplotlib
+matplotlib.use("Agg")  # figures are only saved to PNG, no interactive GUI backend needed
 import matplotlib.pyplot as plt
 
-def network_graph(csv_path, return_png = False, png_filename = None, title = None, edge_labels = False):
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # the solver kernels then run as plain Python
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+    prange = range
+
+
+# pandas' multithreaded PyArrow CSV parser when pyarrow is installed, its default C parser otherwise
+_CSV_ENGINE = "pyarrow" if find_spec("pyarrow") is not None else "c"
+
+
+class _Buffer(array):
     """
-    Build a directed graph from the CSV file
+    array.array of raw C values with the fill() method the kernels call on NumPy buffers
+    """
+    def fill(self, value):
+        self[:] = array(self.typecode, [value]) * len(self)
+
+
+_TYPECODES = {"int32": "i", "int64": "q", "float64": "d", "uint8": "B"}
+
+
+def _buffer(n, value, dtype):
+    """
+    Kernel work buffer of n items set to value: a NumPy array when Numba is available,
+    otherwise an array.array, whose item access from plain Python is much cheaper than NumPy's
+    """
+    if HAVE_NUMBA:
+        return np.full(n, value, dtype)
+    typecode = _TYPECODES[np.dtype(dtype).name]
+    return _Buffer(typecode, array(typecode, [value]) * n)
+
+
+def _edge_arrays(G, flow):
+    """
+    The CSR edge arrays (indptr, indices, capacity, flow, rev) as the kernels take them:
+    G's own NumPy arrays when Numba is available, otherwise array.array copies like the _buffer work buffers,
+    since the plain-Python kernels index these on every edge they scan
+    np.asarray turns the flow back into a NumPy array once the kernels are done
+    """
+    arrays = (G.indptr, G.indices, G.capacity, flow, G.rev)
+    if HAVE_NUMBA:
+        return arrays
+    return tuple(_Buffer(_TYPECODES[arr.dtype.name], arr.tobytes()) for arr in arrays)
+
+
+@dataclass(slots=True)
+class CSRGraph:
+    """
+    Compressed sparse row (CSR) form of the residual network
+    Edges leaving node u are stored at positions indptr[u]:indptr[u+1] of the edge arrays
+    Every reaction u -> v is stored as a forward edge plus a reverse sibling v -> u of capacity 0
+    """
+    indptr: np.ndarray    # int32[n+1], offset of each node's first outgoing edge
+    indices: np.ndarray   # int32[2m], target node of each edge
+    tails: np.ndarray     # int32[2m], source node of each edge
+    capacity: np.ndarray  # int32/int64[2m] if every CSV capacity is integral, else float64[2m]
+    flow: np.ndarray      # same dtype as capacity, flow[rev[k]] == -flow[k]
+    rev: np.ndarray       # int32[2m], index of the sibling edge
+    forward: np.ndarray   # bool[2m], True for edges read from the CSV
+    enzyme: np.ndarray    # object[2m], enzyme catalyzing each reaction
+    name2id: dict         # metabolite name -> int node id
+    id2name: np.ndarray   # int node id -> metabolite name
+
+    def to_networkx(self):
+        """
+        Convert the forward edges back to a NetworkX DiGraph for plotting and printing
+        Repeated (source, target) reactions become one edge carrying their summed capacity and flow
+        """
+        G = nx.DiGraph()
+        G.add_nodes_from(self.id2name)
+        for current_node in range(len(self.id2name)):
+            for k in range(self.indptr[current_node], self.indptr[current_node + 1]):
+                if self.forward[k]:
+                    u, v = self.id2name[current_node], self.id2name[self.indices[k]]
+                    if G.has_edge(u, v):
+                        data = G[u][v]
+                        data["enzyme"] = f"{data['enzyme']}/{self.enzyme[k]}"
+                        data["capacity"] += float(self.capacity[k])
+                        data["flow"] += float(self.flow[k])
+                    else:
+                        G.add_edge(u, v, enzyme=self.enzyme[k], capacity=float(self.capacity[k]),
+                                   flow=float(self.flow[k]))
+        return G
+
+
+def build_graph(csv_path):
+    """
+    Build the CSR residual graph from the CSV file
+    Cached on the file's path and modification time, so repeat calls (REPL, notebooks) skip the parse;
+    the cached arrays are read-only, and every solver returns its flow in a new array
+    """
+    return _build_graph(os.path.abspath(csv_path), os.stat(csv_path).st_mtime_ns)
+
+
+def _capacity_dtype(capacity):
+    """
+    Integral capacities are stored as integers so the solvers run on exact integer residuals:
+    int32 while the total capacity (which bounds every flow and excess) fits in it, int64 beyond that,
+    and float64 when even int64 would overflow
+    Capacities that are missing, non-numeric or negative are rejected here, at load time
+    """
+    if capacity.dtype.kind not in "iuf" or np.isnan(capacity).any() or (capacity < 0).any():
+        raise ValueError("capacity column must hold non-negative numbers")
+    if capacity.dtype.kind not in "iu" and not np.all(capacity % 1 == 0):
+        return np.float64
+    total = capacity.sum(dtype=np.float64)  # an integer sum could wrap around
+    if total <= np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64 if total < 2.0 ** 63 else np.float64  # 2**63 - 1 is not exact in float64
+
+
+@lru_cache(maxsize=8)
+def _build_graph(csv_path, mtime):
+    df = pd.read_csv(csv_path, engine=_CSV_ENGINE)
+    m = len(df)
+
+    # integer node ids, numbered in order of first appearance (same node order as network_graph)
+    codes, id2name = pd.factorize(df[["source", "target"]].to_numpy().ravel())
+    codes = codes.reshape(-1, 2)
+    n = len(id2name)
+
+    # edge i (i < m) is the CSV reaction, edge i + m its reverse sibling
+    tails = np.concatenate([codes[:, 0], codes[:, 1]])
+    heads = np.concatenate([codes[:, 1], codes[:, 0]])
+    capacity = df["capacity"].to_numpy()
+    capacity = capacity.astype(_capacity_dtype(capacity))
+    capacity = np.concatenate([capacity, np.zeros(m, dtype=capacity.dtype)])
+    enzyme = np.concatenate([df["enzyme"].to_numpy(dtype=object)] * 2)
+
+    order = np.argsort(tails, kind="stable")  # group edges by source node, keeping CSV order within a group
+    position = np.empty(2 * m, dtype=np.int32)  # where each unsorted edge ends up in CSR order
+    position[order] = np.arange(2 * m)
+
+    G = CSRGraph(
+        indptr=np.searchsorted(tails[order], np.arange(n + 1)).astype(np.int32),
+        indices=heads[order].astype(np.int32),
+        tails=tails[order].astype(np.int32),
+        capacity=capacity[order],
+        flow=np.zeros(2 * m, dtype=capacity.dtype),  # initialize flow as 0 on all edges
+        rev=position[(order + m) % (2 * m)],
+        forward=order < m,
+        enzyme=enzyme[order],
+        name2id={name: i for i, name in enumerate(id2name)},
+        id2name=np.asarray(id2name, dtype=object)
+    )
+    # the graph is cached and its arrays are shared by every solver result, so nobody may write to them
+    for arr in (G.indptr, G.indices, G.tails, G.capacity, G.flow, G.rev, G.forward, G.enzyme, G.id2name):
+        arr.flags.writeable = False
+    return G
+
+
+@lru_cache(maxsize=8)
+def _kamada_kawai(nodes, edges):
+    """
+    Kamada-Kawai layout, memoized on the node/edge sequence so every render of the same network reuses it
     """
-    df = pd.read_csv(csv_path)
     G = nx.DiGraph()
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
+    return nx.kamada_kawai_layout(G, scale=8.0)
 
-    for _, reaction in df.iterrows():  #add nodes and edges
-        G.add_edge(
-            reaction["source"],
-            reaction["target"],
-            enzyme=reaction["enzyme"],
-            capacity=float(reaction["capacity"]),
-            flow=0.0   # initialize flow as 0 on all edges
-        )
+
+def graph_layout(G, manual_pos=None):
+    """
+    Node positions used for drawing G
+    Positions in manual_pos are used as-is; the layout solver only runs if some node of G is missing from it
+    """
+    if manual_pos is not None:
+        missing = [node for node in G.nodes() if node not in manual_pos]
+        if not missing:
+            return manual_pos
+        pos = dict(_kamada_kawai(tuple(G.nodes()), tuple(G.edges())))
+        pos.update(manual_pos)
+        return pos
+    return dict(_kamada_kawai(tuple(G.nodes()), tuple(G.edges())))  # a copy, so callers cannot edit the cache
+
+
+def network_graph(csv_path, return_png = False, png_filename = None, title = None, edge_labels = False, pos = None,
+                  dpi = 300):
+    """
+    Build a directed graph from the CSV file
+    """
+    df = pd.read_csv(csv_path, engine=_CSV_ENGINE, dtype={"capacity": np.float64})
+    # add nodes and edges straight from the columns
+    G = nx.from_pandas_edgelist(df, "source", "target", edge_attr=["enzyme", "capacity"], create_using=nx.DiGraph)
+    nx.set_edge_attributes(G, 0.0, "flow")  # initialize flow as 0 on all edges
 
     if return_png == True:
-        pos = nx.kamada_kawai_layout(G, scale=8.0)
-        plt.figure(figsize=(4, 12))
-        plt.title(title)
-        nx.draw(G, pos, with_labels=True, node_color="skyblue", node_size=800, arrows=True, arrowsize=20)
-        if edge_labels == True:
-            edge_labels = {(u, v): f"{G[u][v]['flow']}/{G[u][v]['capacity']}\n{G[u][v]['enzyme']}" for u, v in G.edges()}
-            nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color="black", font_size=8)
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color="black")
-        plt.tight_layout()
-        plt.savefig(png_filename, format="png", dpi=300,bbox_inches='tight')
+        render_network(G, png_filename=png_filename, title=title, edge_labels=edge_labels, pos=pos, dpi=dpi)
 
     return G
 
 
-def plot_graph(G, png_filename = None, title = None, edge_labels = False):
-    pos = nx.kamada_kawai_layout(G, scale=8.0)
+def render_network(G, png_filename = None, title = None, edge_labels = False, pos = None, dpi = 300):
+    """
+    Draw the reaction network before any flow is assigned
+    """
+    pos = graph_layout(G, pos)
+    plt.figure(figsize=(4, 12))
+    plt.title(title)
+    nx.draw(G, pos, with_labels=True, node_color="skyblue", node_size=800, arrows=True, arrowsize=20)
+    if edge_labels == True:
+        edge_labels = {(u, v): f"{d['flow']}/{d['capacity']}\n{d['enzyme']}" for u, v, d in G.edges(data=True)}
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color="black", font_size=8)
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color="black")
+    plt.tight_layout()
+    plt.savefig(png_filename, format="png", dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def plot_graph(G, png_filename = None, title = None, edge_labels = False, pos = None, dpi = 300):
+    pos = graph_layout(G, pos)
     plt.figure(figsize=(4, 12))
     plt.title(title)
     nx.draw(G, pos, with_labels=True, node_color="yellow", node_size=800, arrows=True, arrowsize=20)
     if edge_labels == True:
-        edge_labels = {(u, v): f"{G[u][v]['flow']}/{G[u][v]['capacity']}\n{G[u][v]['enzyme']}" for u, v in G.edges()}
+        edge_labels = {(u, v): f"{d['flow']}/{d['capacity']}\n{d['enzyme']}" for u, v, d in G.edges(data=True)}
         nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color="black", font_size=8)
     plt.tight_layout()
-    plt.savefig(png_filename, format="png", dpi=300, bbox_inches='tight')
+    plt.savefig(png_filename, format="png", dpi=dpi, bbox_inches='tight')
+    plt.close()
     
 
-def bfs_augmenting_path(G, source, sink):
+@njit(cache=True, boundscheck=False)
+def _bfs_csr(indptr, indices, cap, flow, source, sink, parent, parent_edge, min_res, queue, delta):
     """
-    Find an augmenting path using breadth-first search
-    Record traversed nodes
+    Find an augmenting path using breadth-first search on the CSR graph
+    Record the parent node and the edge used to reach every traversed node,
+    and in min_res the bottleneck capacity of the path from the source to it
+    (min_res[source] is set once by the caller to a value no residual can exceed)
+    Only edges with residual capacity >= delta are used (any positive residual when delta is 0)
     """
-    visited = set()
-    queue = deque([source])
-    traversal = {source: None}  # enables path reconstruction
-    visited.add(source)
+    parent.fill(-1)  # -1 marks nodes that have not been visited yet
+    parent[source] = source
+    queue[0] = source
+    head, tail = 0, 1  # the queue holds each node at most once, so n slots are enough
+
+    while head < tail:
+        current_node = queue[head]  # while there are nodes to explore, the first node we added to the queue is
+        head += 1                   # the first one to traverse
+
+        for k in range(indptr[current_node], indptr[current_node + 1]):
+            next_node = indices[k]
+            residual = cap[k] - flow[k]  # residual capacity: how much flow this edge can still sustain
+            # only visit nodes connected to edges with (enough) residual capacity
+            if residual > 0 and residual >= delta and parent[next_node] == -1:
+                parent[next_node] = current_node
+                parent_edge[next_node] = k
+                min_res[next_node] = min(min_res[current_node], residual)
+                queue[tail] = next_node
+                tail += 1
 
-    while queue:
-        current_node = queue.popleft()  # while there are nodes to explore, the first node we added to the queue is
-                                        # the first one to traverse
+                if next_node == sink:
+                    return True  # augmenting path found
 
-        for next_node in G[current_node]:
-            cap = G[current_node][next_node]["capacity"] - G[current_node][next_node]["flow"]  # residual capacity: how much flow this edge can still sustain
+    return False  # no augmenting path exists
 
-            if cap > 0 and next_node not in visited:  # only visit nodes connected to edges with residual capacity
-                visited.add(next_node)
-                traversal[next_node] = current_node
-                queue.append(next_node)
 
-                if next_node == sink:
-                    return traversal  # augmenting path found
+@njit(cache=True, boundscheck=False)
+def _bibfs_csr(indptr, indices, cap, flow, rev, source, sink, parent, parent_edge, child, child_edge,
+               min_res, min_res_sink, queue, queue_sink, delta):
+    """
+    Bidirectional breadth-first search: grow one BFS from the source and one from the sink,
+    one level at a time (smaller frontier first), and stop as soon as they meet
+    The source side is recorded as in _bfs_csr; on the sink side child[u] is the next node
+    towards the sink, child_edge[u] the edge u -> child[u] and min_res_sink[u] its bottleneck
+    (min_res_sink[sink] is set once by the caller like min_res[source])
+    Edges are admissible as in _bfs_csr; returns the meeting node, or -1 if no augmenting path exists
+    """
+    parent.fill(-1)  # -1 marks nodes that have not been visited yet
+    child.fill(-1)
+    parent[source] = source
+    child[sink] = sink
+    queue[0] = source
+    queue_sink[0] = sink
+    head, tail = 0, 1
+    head_sink, tail_sink = 0, 1
+
+    while head < tail and head_sink < tail_sink:
+        if tail - head <= tail_sink - head_sink:
+            level_end = tail
+            while head < level_end:
+                current_node = queue[head]
+                head += 1
+                for k in range(indptr[current_node], indptr[current_node + 1]):
+                    next_node = indices[k]
+                    residual = cap[k] - flow[k]
+                    if residual > 0 and residual >= delta and parent[next_node] == -1:
+                        parent[next_node] = current_node
+                        parent_edge[next_node] = k
+                        min_res[next_node] = min(min_res[current_node], residual)
+                        if child[next_node] != -1:
+                            return next_node  # frontiers meet
+                        queue[tail] = next_node
+                        tail += 1
+        else:
+            level_end = tail_sink
+            while head_sink < level_end:
+                current_node = queue_sink[head_sink]
+                head_sink += 1
+                # edges into current_node are the siblings of the edges stored in its own row
+                for j in range(indptr[current_node], indptr[current_node + 1]):
+                    prev_node = indices[j]
+                    k = rev[j]  # edge prev_node -> current_node
+                    residual = cap[k] - flow[k]
+                    if residual > 0 and residual >= delta and child[prev_node] == -1:
+                        child[prev_node] = current_node
+                        child_edge[prev_node] = k
+                        min_res_sink[prev_node] = min(min_res_sink[current_node], residual)
+                        if parent[prev_node] != -1:
+                            return prev_node  # frontiers meet
+                        queue_sink[tail_sink] = prev_node
+                        tail_sink += 1
+
+    return -1  # one side ran out of nodes, no augmenting path exists
+
+
+@njit(cache=True, boundscheck=False)
+def _augment(flow, rev, parent, parent_edge, source, sink, bottleneck):
+    """
+    Push the bottleneck capacity along the path found by _bfs_csr
+    Also used for either half of a _bibfs_csr path, following parent (or child) links from sink to source
+    """
+    # walk backward through the augmenting path - from the sink to the source - cancelling
+    # the same amount on each reverse edge
+    node = sink
+    while node != source:
+        k = parent_edge[node]
+        flow[k] += bottleneck
+        flow[rev[k]] -= bottleneck
+        node = parent[node]
 
-    return None  # no augmenting path exists
+
+def _unbounded(dtype):
+    """
+    Starting value for bottleneck searches, larger than any residual of the given capacity dtype
+    """
+    return np.inf if dtype.kind == "f" else np.iinfo(dtype).max
+
+
+def _flow_value(G, source):
+    """
+    Net flow leaving the source: an int for integer capacities, a float otherwise
+    """
+    # the source's row holds its outgoing edges plus the (negative) siblings of edges into it
+    return G.flow[G.indptr[source]:G.indptr[source + 1]].sum().item()
 
 
-def ff_max(G, source, sink):
+def _scaling_phases(cap):
+    """
+    Capacity-scaling thresholds: powers of two from the largest capacity down to 1, then 0
+    The final 0 phase accepts any positive residual, so capacities below 1 are still saturated
+    """
+    largest = cap.max(initial=0.0)
+    if largest < 1:
+        return [0.0]
+    delta = 2.0 ** int(np.log2(largest))  # log2 >= 0 here, so int() rounds down
+    phases = []
+    while delta >= 1:
+        phases.append(delta)
+        delta /= 2
+    return phases + [0.0]
+
+
+def ff_max(G, source, sink, bidirectional=True, capacity_scaling=False, method="edmonds_karp"):
     """
     Ford Fulkerson to find max flow in a network
     and  accordingly update the corresponding flows on each edge
+    Augmenting paths come from a bidirectional BFS unless bidirectional=False
+    With capacity_scaling=True, paths with large residual capacity are augmented first (see _scaling_phases)
+    method="dinic", "preflow_push" or "scipy" hands the network to dinic_maxflow / preflow_push_maxflow /
+    scipy_maxflow instead
     """
-    max_flow = 0.0  # accumulate total flow from source to sink
-    G_modified = copy.deepcopy(G)
-    
+    if method == "dinic":
+        return dinic_maxflow(G, source, sink)
+    if method == "preflow_push":
+        return preflow_push_maxflow(G, source, sink)
+    if method == "scipy":
+        return scipy_maxflow(G, source, sink)
+    if method != "edmonds_karp":
+        raise ValueError(f"Unknown max-flow method: {method}")
+
+    source, sink = G.name2id[source], G.name2id[sink]
+    indptr, indices, cap, flow, rev = _edge_arrays(G, np.zeros_like(G.capacity))  # fresh flow buffer
+    dtype = G.capacity.dtype
+
+    # BFS work buffers, allocated once and reused by every search
+    n = len(G.id2name)
+    parent = _buffer(n, -1, np.int32)
+    parent_edge = _buffer(n, -1, np.int32)
+    min_res = _buffer(n, 0, dtype)
+    min_res[source] = _unbounded(dtype)
+    queue = _buffer(n, 0, np.int32)
+    if bidirectional:
+        child = _buffer(n, -1, np.int32)
+        child_edge = _buffer(n, -1, np.int32)
+        min_res_sink = _buffer(n, 0, dtype)
+        min_res_sink[sink] = _unbounded(dtype)
+        queue_sink = _buffer(n, 0, np.int32)
+
+    for delta in (_scaling_phases(G.capacity) if capacity_scaling else [0.0]):
+        if bidirectional:
+            while True:
+                meet = _bibfs_csr(indptr, indices, cap, flow, rev, source, sink, parent, parent_edge, child, child_edge,
+                                  min_res, min_res_sink, queue, queue_sink, delta)
+                if meet == -1:
+                    break  # no more augmenting paths at this delta
+                bottleneck = min(min_res[meet], min_res_sink[meet])
+                _augment(flow, rev, parent, parent_edge, source, meet, bottleneck)  # source -> meet half
+                _augment(flow, rev, child, child_edge, sink, meet, bottleneck)  # meet -> sink half
+        else:
+            while _bfs_csr(indptr, indices, cap, flow, source, sink, parent, parent_edge, min_res, queue, delta):
+                bottleneck = min_res[sink]  # bottleneck capacity on this path, tracked during the BFS
+                _augment(flow, rev, parent, parent_edge, source, sink, bottleneck)
+
+    G_modified = replace(G, flow=np.asarray(flow))  # shares the topology arrays
+    return _flow_value(G_modified, source), G_modified
+
+
+@njit(cache=True, parallel=True)
+def _maxflow_batch(indptr, indices, cap, rev, sources, sinks, unbounded, values):
+    """
+    Edmonds-Karp max-flow value of every (sources[p], sinks[p]) pair, stored in values[p]
+    Pairs are independent, so they are spread over threads; each one works on its own flow and BFS buffers
+    """
+    n = len(indptr) - 1
+    for p in prange(len(sources)):
+        source, sink = sources[p], sinks[p]
+        flow = np.zeros_like(cap)
+        parent = np.empty(n, dtype=np.int32)
+        parent_edge = np.empty(n, dtype=np.int32)
+        min_res = np.zeros(n, dtype=cap.dtype)
+        min_res[source] = unbounded
+        queue = np.empty(n, dtype=np.int32)
+
+        while _bfs_csr(indptr, indices, cap, flow, source, sink, parent, parent_edge, min_res, queue, 0.0):
+            _augment(flow, rev, parent, parent_edge, source, sink, min_res[sink])
+
+        values[p] = flow[indptr[source]:indptr[source + 1]].sum()  # net flow leaving the source
+
+
+def max_flow_batch(G, pairs):
+    """
+    Max-flow value for each (source, sink) pair of metabolite names, computed in parallel on the same network
+    Only the values are returned (ints for integer capacities, floats otherwise); use ff_max for the edge flows
+    """
+    if not HAVE_NUMBA:  # no threads to spread the pairs over; ff_max runs the same search on array.array buffers
+        return [ff_max(G, source, sink, bidirectional=False)[0] for source, sink in pairs]
+
+    sources = np.array([G.name2id[source] for source, _ in pairs], dtype=np.int32)
+    sinks = np.array([G.name2id[sink] for _, sink in pairs], dtype=np.int32)
+    values = np.zeros(len(sources), dtype=G.capacity.dtype)
+
+    _maxflow_batch(G.indptr, G.indices, G.capacity, G.rev, sources, sinks, _unbounded(G.capacity.dtype), values)
+
+    return values.tolist()
+
+
+@njit(cache=True, boundscheck=False)
+def _build_level_graph(indptr, indices, cap, flow, source, sink, level, queue):
+    """
+    Dinic phase 1: label every node with its BFS distance from the source in the residual graph
+    """
+    level.fill(-1)  # -1 marks nodes outside the level graph
+    level[source] = 0
+    queue[0] = source
+    head, tail = 0, 1
+
+    while head < tail:
+        current_node = queue[head]
+        head += 1
+        for k in range(indptr[current_node], indptr[current_node + 1]):
+            next_node = indices[k]
+            if cap[k] - flow[k] > 0 and level[next_node] == -1:
+                level[next_node] = level[current_node] + 1
+                if next_node == sink:
+                    return True  # nodes further away than the sink can never be on a shortest path
+                queue[tail] = next_node
+                tail += 1
+
+    return False  # sink unreachable, flow is maximal
+
+
+@njit(cache=True, boundscheck=False)
+def _augment_paths(indptr, indices, cap, flow, rev, level, progress, stack, source, sink, unbounded):
+    """
+    Dinic phase 2: push a blocking flow through the level graph with an iterative DFS
+    progress[u] is the next edge of u to try, so every edge is dropped at most once per phase
+    """
+    for node in range(len(progress)):
+        progress[node] = indptr[node]
+    depth = 0  # stack[:depth] holds the edges of the current source -> current_node path
+    current_node = source
+
     while True:
-        augmenting_path = bfs_augmenting_path(G_modified, source, sink)  
-        if augmenting_path is None:
-            break  # no more augmenting paths
+        if current_node == sink:
+            # bottleneck along the path, remembering the first edge it saturates
+            bottleneck = unbounded
+            saturated = 0
+            for i in range(depth):
+                k = stack[i]
+                if cap[k] - flow[k] < bottleneck:
+                    bottleneck = cap[k] - flow[k]
+                    saturated = i
+            for i in range(depth):
+                k = stack[i]
+                flow[k] += bottleneck
+                flow[rev[k]] -= bottleneck
+
+            # retreat to the tail of the saturated edge and keep searching from there
+            depth = saturated
+            current_node = indices[rev[stack[depth]]]
+            continue
+
+        advanced = False
+        while progress[current_node] < indptr[current_node + 1]:
+            k = progress[current_node]
+            next_node = indices[k]
+            if cap[k] - flow[k] > 0 and level[next_node] == level[current_node] + 1:
+                stack[depth] = k
+                depth += 1
+                current_node = next_node
+                advanced = True
+                break
+            progress[current_node] += 1
+
+        if not advanced:
+            if current_node == source:
+                break  # blocking flow reached
+            # dead end: back up one edge and skip it from now on
+            depth -= 1
+            current_node = indices[rev[stack[depth]]]
+            progress[current_node] += 1
+
+
+def dinic_maxflow(G, source, sink):
+    """
+    Dinic's algorithm to find max flow in a network: alternate a BFS level graph with a blocking flow
+    and accordingly update the corresponding flows on each edge
+    """
+    source, sink = G.name2id[source], G.name2id[sink]
+    indptr, indices, cap, flow, rev = _edge_arrays(G, np.zeros_like(G.capacity))  # fresh flow buffer
 
-        # Walk backward through the augmenting path - from the sink to the source - to reconstruct the augmenting path
-        path = []  # accumulate edge pairs
-        start_node = sink
-        while augmenting_path[start_node] is not None:
-            current_node = augmenting_path[start_node]
-            path.append((current_node, start_node))
-            start_node = current_node
-        path.reverse()  # augmenting path, from source to sink
+    # work buffers, allocated once and reused by every phase
+    n = len(G.id2name)
+    level = _buffer(n, -1, np.int32)
+    progress = _buffer(n, 0, np.int32)  # current-arc pointer of each node
+    queue = _buffer(n, 0, np.int32)
+    stack = _buffer(n, 0, np.int32)  # a level graph path has at most n - 1 edges
 
-        # calculate bottleneck capacity on this path
-        bottleneck = float("inf")
-        for current_node, start_node in path:
-            residual = G_modified[current_node][start_node]["capacity"] - G_modified[current_node][start_node]["flow"]  
-            bottleneck = min(bottleneck, residual)
+    while _build_level_graph(indptr, indices, cap, flow, source, sink, level, queue):
+        _augment_paths(indptr, indices, cap, flow, rev, level, progress, stack, source, sink,
+                       _unbounded(G.capacity.dtype))
 
-        # augment flow along the path
-        for current_node, start_node in path:
-            G_modified[current_node][start_node]["flow"] += bottleneck  # update flows on graph object
+    G_modified = replace(G, flow=np.asarray(flow))  # shares the topology arrays
+    return _flow_value(G_modified, source), G_modified
 
-        max_flow += bottleneck
 
-    return max_flow, G_modified
+@njit(cache=True, boundscheck=False)
+def _global_relabel(indptr, indices, cap, flow, rev, source, sink, height, queue):
+    """
+    Push-relabel heuristic: reset every height to its exact residual distance to the sink,
+    or to n + distance to the source for nodes that can no longer reach the sink (2n if neither)
+    """
+    n = len(height)
+    height.fill(2 * n)
+    height[sink] = 0
+    height[source] = n
+    for root in (sink, source):
+        queue[0] = root
+        head, tail = 0, 1
+        while head < tail:  # BFS over residual edges pointing into current_node
+            current_node = queue[head]
+            head += 1
+            for j in range(indptr[current_node], indptr[current_node + 1]):
+                prev_node = indices[j]
+                k = rev[j]  # edge prev_node -> current_node
+                if cap[k] - flow[k] > 0 and height[prev_node] == 2 * n:
+                    height[prev_node] = height[current_node] + 1
+                    queue[tail] = prev_node
+                    tail += 1
+
+
+@njit(cache=True, boundscheck=False)
+def _preflow_push(indptr, indices, cap, flow, rev, source, sink, height, excess, current, count,
+                  bucket_head, bucket_next, queue):
+    """
+    Highest-label push-relabel: always discharge the active node (positive excess) with the largest height
+    Active nodes are kept in linked-list buckets by height; heights are recomputed with _global_relabel
+    every n relabels and lifted above n when a gap empties some height below n
+    """
+    n = len(height)
+
+    # saturate every edge leaving the source
+    for k in range(indptr[source], indptr[source + 1]):
+        residual = cap[k] - flow[k]
+        if residual > 0:
+            flow[k] += residual
+            flow[rev[k]] -= residual
+            excess[indices[k]] += residual
+            excess[source] -= residual
+
+    relabels = n  # forces a global relabel before the first discharge
+    max_active = -1
+    while True:
+        if relabels >= n:
+            relabels = 0
+            _global_relabel(indptr, indices, cap, flow, rev, source, sink, height, queue)
+            count.fill(0)
+            bucket_head.fill(-1)
+            max_active = -1
+            for node in range(n):
+                count[height[node]] += 1
+                current[node] = indptr[node]
+                if excess[node] > 0 and node != source and node != sink and height[node] < 2 * n:
+                    bucket_next[node] = bucket_head[height[node]]
+                    bucket_head[height[node]] = node
+                    max_active = max(max_active, height[node])
+
+        # pick the highest active node
+        while max_active >= 0 and bucket_head[max_active] == -1:
+            max_active -= 1
+        if max_active < 0:
+            break  # no active nodes left: the preflow is a maximum flow
+        current_node = bucket_head[max_active]
+        bucket_head[max_active] = bucket_next[current_node]
+        if height[current_node] != max_active:
+            # lifted by a gap while waiting in a lower bucket, file it under its new height
+            bucket_next[current_node] = bucket_head[height[current_node]]
+            bucket_head[height[current_node]] = current_node
+            max_active = max(max_active, height[current_node])
+            continue
+
+        # discharge: push along admissible edges (residual > 0 and one level down) until the excess is gone
+        while excess[current_node] > 0 and current[current_node] < indptr[current_node + 1]:
+            k = current[current_node]
+            next_node = indices[k]
+            residual = cap[k] - flow[k]
+            if residual > 0 and height[current_node] == height[next_node] + 1:
+                pushed = min(excess[current_node], residual)
+                flow[k] += pushed
+                flow[rev[k]] -= pushed
+                excess[current_node] -= pushed
+                if excess[next_node] == 0 and next_node != source and next_node != sink:
+                    bucket_next[next_node] = bucket_head[height[next_node]]  # next_node becomes active
+                    bucket_head[height[next_node]] = next_node
+                excess[next_node] += pushed
+            else:
+                current[current_node] += 1
+
+        if excess[current_node] > 0:
+            # relabel: lift current_node just above its lowest residual neighbour
+            old_height = height[current_node]
+            new_height = 2 * n
+            for k in range(indptr[current_node], indptr[current_node + 1]):
+                if cap[k] - flow[k] > 0:
+                    new_height = min(new_height, height[indices[k]] + 1)
+            count[old_height] -= 1
+            count[new_height] += 1
+            height[current_node] = new_height
+            current[current_node] = indptr[current_node]
+            relabels += 1
+
+            if count[old_height] == 0 and old_height < n:
+                # gap: nodes above the empty height can no longer reach the sink
+                for node in range(n):
+                    if old_height < height[node] < n:
+                        count[height[node]] -= 1
+                        height[node] = n + 1
+                        count[n + 1] += 1
+                        current[node] = indptr[node]
+
+            if height[current_node] < 2 * n:
+                bucket_next[current_node] = bucket_head[height[current_node]]
+                bucket_head[height[current_node]] = current_node
+                max_active = max(max_active, height[current_node])
+
+
+def preflow_push_maxflow(G, source, sink):
+    """
+    Push-relabel (preflow-push) algorithm to find max flow in a network
+    and accordingly update the corresponding flows on each edge
+    """
+    source, sink = G.name2id[source], G.name2id[sink]
+    indptr, indices, cap, flow, rev = _edge_arrays(G, np.zeros_like(G.capacity))  # fresh flow buffer
 
+    # work buffers
+    n = len(G.id2name)
+    height = _buffer(n, 0, np.int32)
+    excess = _buffer(n, 0, G.capacity.dtype)
+    current = _buffer(n, 0, np.int32)  # current-arc pointer of each node
+    count = _buffer(2 * n + 1, 0, np.int32)  # number of nodes at each height
+    bucket_head = _buffer(2 * n + 1, -1, np.int32)  # first active node at each height
+    bucket_next = _buffer(n, -1, np.int32)
+    queue = _buffer(n, 0, np.int32)
 
-def min_cut(G, source):
+    _preflow_push(indptr, indices, cap, flow, rev, source, sink, height, excess, current, count,
+                  bucket_head, bucket_next, queue)
+
+    G_modified = replace(G, flow=np.asarray(flow))  # shares the topology arrays
+    return _flow_value(G_modified, source), G_modified
+
+
+def scipy_maxflow(G, source, sink):
     """
-    Min cut after max-flow computation - path where total network capacity is minimized
+    Max flow with SciPy's compiled Dinic solver (scipy.sparse.csgraph.maximum_flow)
+    SciPy only accepts int32 capacities and adds parallel reactions together, so this needs a network
+    build_graph stored as int32: integral capacities whose total fits in int32
+    """
+    from scipy.sparse import csr_matrix  # optional dependency, only needed for this solver
+    from scipy.sparse.csgraph import maximum_flow
+
+    if G.capacity.dtype != np.int32:  # the summed parallel capacities could wrap around otherwise
+        raise ValueError("scipy_maxflow needs integer capacities whose total fits in int32; use another method")
+
+    n = len(G.id2name)
+    forward = np.nonzero(G.forward)[0]
+    tails, heads = G.tails[forward], G.indices[forward]
+    graph = csr_matrix((G.capacity[forward].astype(np.int32), (tails, heads)), shape=(n, n))
+    result = maximum_flow(graph, G.name2id[source], G.name2id[sink], method="dinic")
+
+    # SciPy sums parallel edges and reports the net flow between each node pair (flow[u, v] == -flow[v, u]);
+    # hand each pair's positive net flow out over its parallel edges in that direction, filling them in CSR order
+    net = np.maximum(np.asarray(result.flow[tails, heads]).ravel(), 0)
+    cap = G.capacity[forward]
+    order = np.lexsort((heads, tails))  # parallel edges next to each other, in CSR order within a pair
+    filled = np.cumsum(cap[order]) - cap[order]  # capacity of the pair's edges placed before this one (+ offset)
+    first = np.r_[True, (np.diff(tails[order]) != 0) | (np.diff(heads[order]) != 0)]
+    filled -= np.maximum.accumulate(np.where(first, filled, 0))  # drop the offset of earlier pairs
+    share = np.empty_like(cap)
+    share[order] = np.clip(net[order] - filled, 0, cap[order])
+
+    flow = np.zeros_like(G.capacity)
+    flow[forward] = share
+    flow[G.rev[forward]] = -flow[forward]
+
+    return int(result.flow_value), replace(G, flow=flow)
+
+
+@njit(cache=True, boundscheck=False)
+def _residual_reach(indptr, indices, cap, flow, source, visited, queue):
     """
-    visited = set()
-    queue = deque([source])
-    visited.add(source)
+    Mark in visited every node reachable from the source in the residual graph
+    """
+    visited[source] = 1
+    queue[0] = source
+    head, tail = 0, 1  # every node is queued at most once, so n slots are enough
 
     # BFS
-    while queue:
-        current_node = queue.popleft()
-        for next_node in G[current_node]:
-            residual = G[current_node][next_node]["capacity"] - G[current_node][next_node]["flow"]
-            if residual > 0 and next_node not in visited:
-                visited.add(next_node)
-                queue.append(next_node)
+    while head < tail:
+        current_node = queue[head]
+        head += 1
+        for k in range(indptr[current_node], indptr[current_node + 1]):
+            next_node = indices[k]
+            residual = cap[k] - flow[k]  # reverse edges carry the flow that can be cancelled
+            if residual > 0 and not visited[next_node]:
+                visited[next_node] = 1
+                queue[tail] = next_node
+                tail += 1
 
-    reach = visited  # nodes that can be reached from the source node
-    no_reach = set(G.nodes()) - reach  # nodes that cannot be reached from the source node
+
+def min_cut(G, source):
+    """
+    Min cut after max-flow computation - path where total network capacity is minimized
+    """
+    n = len(G.id2name)
+    visited = _buffer(n, 0, np.uint8)  # one byte per node instead of a hashed set
+    indptr, indices, cap, flow, _ = _edge_arrays(G, G.flow)
+    _residual_reach(indptr, indices, cap, flow, G.name2id[source], visited, _buffer(n, 0, np.int32))
+
+    in_reach = np.frombuffer(visited, dtype=bool)
 
     # edges crossing from reach to no_reach; these are min-cut edges aka no more flow can go through them
-    mincut_edges = []
-    for current_node in reach:
-        for next_node in G[current_node]:
-            if next_node in no_reach:
-                mincut_edges.append((current_node, next_node))
-    
-    rate_limiting_enzymes = [G[u][v]['enzyme'] for u, v in mincut_edges]
+    cut = np.nonzero(G.forward & in_reach[G.tails] & ~in_reach[G.indices])[0]  # one pass over the edge arrays
+    mincut_edges = [(G.id2name[G.tails[k]], G.id2name[G.indices[k]]) for k in cut]
+    rate_limiting_enzymes = G.enzyme[cut].tolist()
+
+    reach = set(G.id2name[in_reach])  # nodes that can be reached from the source node
+    no_reach = set(G.id2name[~in_reach])  # nodes that cannot be reached from the source node
 
     return reach, no_reach, mincut_edges, rate_limiting_enzymes
 
 
-def main():
-    G = network_graph("glycolysis_network.csv", return_png=True, png_filename="glycolysis.png",
-                      title="Glycolysis") 
-    G = network_graph("glycolysis_network.csv", return_png=True, png_filename="glycolysis_noflow.png", 
-                      title="Glycolysis, Reaction Capacities (No Flow)", edge_labels=True) 
+def run_all(G, source, sink):
+    """
+    Run max flow and min cut back to back and return the results, so no printing sits between the solves
+    """
+    maxflow, G_flow = dinic_maxflow(G, source, sink)
+    reach, no_reach, cut_edges, rate_limiting_enzymes = min_cut(G_flow, source)
 
-    maxflow, G = ff_max(G, "glucose", "pyruvate")
+    return {"max_flow": maxflow, "graph": G_flow, "reach": reach, "no_reach": no_reach,
+            "cut_edges": cut_edges, "enzymes": rate_limiting_enzymes}
+
+
+def format_report(results):
+    """
+    Lines of the text report for the results of run_all
+    """
+    G = results["graph"]
+    lines = ["", f"Maximum flux: {results['max_flow']}", "", "Flow on each edge:"]
+    lines += [f"  {G.id2name[G.tails[k]]} -> {G.id2name[G.indices[k]]}, {G.flow[k]} / {G.capacity[k]}"
+              for k in np.nonzero(G.forward)[0]]
+    lines += ["", "Min cut (bottleneck) reactions:",
+              f"Pre-bottleneck node(s): {results['reach']}",
+              f"Post-bottleneck node(s): {results['no_reach']}",
+              f"Min cut (bottleneck) reaction(s): {results['cut_edges']}",
+              f"Rate-limiting enzyme(s): {results['enzymes']}"]
+    return lines
+
+
+def main():
+    # parse the CSV and lay the network out once; every render below reuses both
+    G = build_graph("glycolysis_network.csv")
+    G_nx = G.to_networkx()
+    pos = graph_layout(G_nx)
 
-    plot_graph(G, png_filename="glycolysis_maxflow.png", title="Glycolysis, Reaction Capacities (Max Flow)", edge_labels=True)
+    # the two input renders are previews; only the max-flow result is saved at full resolution
+    render_network(G_nx, png_filename="glycolysis.png", title="Glycolysis", pos=pos, dpi=150)
+    render_network(G_nx, png_filename="glycolysis_noflow.png", title="Glycolysis, Reaction Capacities (No Flow)",
+                   edge_labels=True, pos=pos, dpi=150)
 
-    print("\nMaximum flux:", maxflow)
+    results = run_all(G, "glucose", "pyruvate")
 
-    print("\nFlow on each edge:")
-    for u, v in G.edges():
-        print(f"  {u} -> {v}, {G[u][v]['flow']} / {G[u][v]['capacity']}")
+    plot_graph(results["graph"].to_networkx(), png_filename="glycolysis_maxflow.png",
+               title="Glycolysis, Reaction Capacities (Max Flow)", edge_labels=True, pos=pos)
 
-    print("\nMin cut (bottleneck) reactions:")
-    reach, no_reach, cut_edges, rate_limiting_enzymes = min_cut(G, "glucose")
-    print("Pre-bottleneck node(s):", reach)
-    print("Post-bottleneck node(s):", no_reach)
-    print("Min cut (bottleneck) reaction(s):", cut_edges)
-    print("Rate-limiting enzyme(s):", rate_limiting_enzymes)
+    print("\n".join(format_report(results)))  # one write for the whole report
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,195 @@
+import importlib.util
+import os
+import sys
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+import glycolysis_graph_analysis as gga
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows, columns=["source", "target", "capacity", "enzyme"]).to_csv(path, index=False)
+    return str(path)
+
+
+def random_network(path, rng, integral):
+    """
+    Random CSV network that may repeat a (source, target) pair and hold antiparallel reactions
+    """
+    n = int(rng.integers(2, 9))
+    rows = []
+    for i in range(int(rng.integers(1, 25))):
+        u, v = rng.choice(n, size=2, replace=False)
+        capacity = int(rng.integers(0, 20)) if integral else round(float(rng.uniform(0, 5)), 2)
+        rows.append((f"m{u}", f"m{v}", capacity, f"E{i}"))
+    return write_csv(path, rows), rows
+
+
+def reference_value(rows, source, sink):
+    G = nx.DiGraph()
+    for u, v, capacity, _ in rows:
+        G.add_edge(u, v, capacity=G[u][v]["capacity"] + capacity if G.has_edge(u, v) else capacity)
+    return nx.maximum_flow_value(G, source, sink)
+
+
+def check_flow(G, source, sink, value):
+    """
+    Every edge flow is within its capacity, skew-symmetric, and conserved at every node but source and sink
+    """
+    flow, cap = G.flow.astype(np.float64), G.capacity.astype(np.float64)
+    assert np.all(flow <= cap + 1e-9)
+    assert np.allclose(flow[G.rev], -flow)
+
+    forward = G.forward
+    net = np.zeros(len(G.id2name))
+    np.add.at(net, G.tails[forward], flow[forward])
+    np.add.at(net, G.indices[forward], -flow[forward])
+    s, t = G.name2id[source], G.name2id[sink]
+    assert net[s] == pytest.approx(value)
+    assert net[t] == pytest.approx(-value)
+    assert np.allclose(np.delete(net, [s, t]), 0)
+
+
+@pytest.fixture(params=["numba", "python"])
+def module(request, monkeypatch):
+    """
+    The module as imported normally, and a fresh copy loaded while numba cannot be imported
+    """
+    if request.param == "numba":
+        if not gga.HAVE_NUMBA:
+            pytest.skip("numba is not installed")
+        return gga
+    monkeypatch.setitem(sys.modules, "numba", None)
+    spec = importlib.util.spec_from_file_location("gga_without_numba", gga.__file__)
+    mod = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, spec.name, mod)
+    spec.loader.exec_module(mod)
+    assert not mod.HAVE_NUMBA
+    return mod
+
+
+SOLVERS = {
+    "dinic": {"method": "dinic"},
+    "edmonds_karp_one_sided": {"bidirectional": False},
+    "edmonds_karp": {},
+    "capacity_scaling": {"capacity_scaling": True},
+    "capacity_scaling_one_sided": {"capacity_scaling": True, "bidirectional": False},
+    "preflow_push": {"method": "preflow_push"},
+    "scipy": {"method": "scipy"},
+}
+
+
+@pytest.mark.parametrize("solver", SOLVERS)
+def test_max_flow_matches_networkx(module, solver, tmp_path):
+    if solver == "scipy":
+        pytest.importorskip("scipy")
+    rng = np.random.default_rng(list(SOLVERS).index(solver))
+    for case in range(40):
+        integral = solver == "scipy" or case % 2 == 0  # SciPy only takes integer capacities
+        csv, rows = random_network(tmp_path / f"net{case}.csv", rng, integral)
+        G = module.build_graph(csv)
+        source, sink = rng.choice(G.id2name, size=2, replace=False)
+
+        value, G_flow = module.ff_max(G, source, sink, **SOLVERS[solver])
+
+        assert value == pytest.approx(reference_value(rows, source, sink))
+        check_flow(G_flow, source, sink, value)
+
+        # the residual cut found by min_cut has exactly the max-flow capacity
+        reach, no_reach, cut_edges, enzymes = module.min_cut(G_flow, source)
+        assert source in reach and sink in no_reach
+        crossing = [(u, v, c) for u, v, c, _ in rows if u in reach and v in no_reach]
+        assert sum(c for *_, c in crossing) == pytest.approx(value)
+        assert sorted(cut_edges) == sorted((u, v) for u, v, _ in crossing)
+        assert len(enzymes) == len(cut_edges)
+
+
+def test_max_flow_batch(module, tmp_path):
+    rng = np.random.default_rng(7)
+    for case in range(20):
+        csv, rows = random_network(tmp_path / f"net{case}.csv", rng, case % 2 == 0)
+        G = module.build_graph(csv)
+        pairs = [tuple(rng.choice(G.id2name, size=2, replace=False)) for _ in range(5)]
+
+        values = module.max_flow_batch(G, pairs)
+
+        assert values == pytest.approx([reference_value(rows, s, t) for s, t in pairs])
+    assert module.max_flow_batch(G, []) == []
+
+
+def test_glycolysis_bottleneck(module):
+    G = module.build_graph(os.path.join(os.path.dirname(__file__), "glycolysis_network.csv"))
+    value, G_flow = module.dinic_maxflow(G, "glucose", "pyruvate")
+    assert value == pytest.approx(0.68)
+    assert module.min_cut(G_flow, "glucose")[2:] == ([("f6p", "f16bp")], ["PFK"])
+
+
+def test_scipy_maxflow_parallel_edges(tmp_path):
+    pytest.importorskip("scipy")
+    csv = write_csv(tmp_path / "multi.csv", [("a", "b", 10, "E1"), ("a", "b", 11, "E2"), ("b", "a", 4, "E3"),
+                                             ("b", "c", 15, "E4"), ("b", "c", 3, "E5"), ("a", "c", 2, "E6")])
+    G = gga.build_graph(csv)
+
+    value, G_flow = gga.scipy_maxflow(G, "a", "c")
+
+    assert value == gga.dinic_maxflow(G, "a", "c")[0] == 20
+    check_flow(G_flow, "a", "c", value)
+
+
+def test_scipy_maxflow_rejects_int32_overflow(tmp_path):
+    pytest.importorskip("scipy")
+    big = 2 ** 31 - 10  # fits in int32, but two parallel reactions summed by csr_matrix do not
+    csv = write_csv(tmp_path / "big.csv", [("a", "b", big, "E1"), ("a", "b", big, "E2"),
+                                           ("b", "c", big, "E3"), ("b", "c", big, "E4")])
+    G = gga.build_graph(csv)
+
+    with pytest.raises(ValueError):
+        gga.scipy_maxflow(G, "a", "c")
+    assert gga.dinic_maxflow(G, "a", "c")[0] == 2 * big
+
+
+@pytest.mark.parametrize("capacities, dtype", [
+    ([2, 3], np.int32),
+    ([0.5, 3], np.float64),
+    ([2.0, 3.0], np.int32),
+    ([2 ** 31, 1], np.int64),
+    ([2 ** 62, 2 ** 62], np.float64),  # the int64 total wraps around
+    ([1e19, 1.0], np.float64),  # integral but beyond int64
+])
+def test_capacity_dtype(capacities, dtype):
+    assert gga._capacity_dtype(np.array(capacities)) == dtype
+
+
+def test_huge_capacities_keep_their_flow(tmp_path):
+    csv = write_csv(tmp_path / "huge.csv", [("a", "b", 2 ** 62, "E1"), ("a", "b", 2 ** 62, "E2")])
+    assert gga.dinic_maxflow(gga.build_graph(csv), "a", "b")[0] == 2.0 ** 63
+
+
+def test_cached_graph_is_read_only(tmp_path):
+    csv = write_csv(tmp_path / "net.csv", [("a", "b", 3, "E1"), ("b", "c", 2, "E2")])
+    _, G_flow = gga.dinic_maxflow(gga.build_graph(csv), "a", "c")
+
+    with pytest.raises(ValueError):
+        G_flow.capacity[0] = 100
+    G_flow.flow[:] = 0  # each result owns its flow array
+    assert gga.build_graph(csv).capacity.tolist() == G_flow.capacity.tolist()
+
+
+def test_to_networkx_sums_repeated_reactions(tmp_path):
+    csv = write_csv(tmp_path / "multi.csv", [("a", "b", 10, "E1"), ("a", "b", 11, "E2"), ("b", "c", 30, "E3")])
+    _, G_flow = gga.dinic_maxflow(gga.build_graph(csv), "a", "c")
+
+    edge = G_flow.to_networkx()["a"]["b"]
+
+    assert (edge["capacity"], edge["flow"], edge["enzyme"]) == (21.0, 21.0, "E1/E2")
+
+
+def test_graph_layout_returns_a_copy():
+    G = gga.build_graph(os.path.join(os.path.dirname(__file__), "glycolysis_network.csv")).to_networkx()
+    pos = gga.graph_layout(G)
+    pos["glucose"] = (100.0, 100.0)
+
+    assert tuple(gga.graph_layout(G)["glucose"]) != (100.0, 100.0)